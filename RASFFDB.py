@@ -4,7 +4,18 @@ import sqlite3
 import os
 import requests
 import base64
+import functools
+import hashlib
+import mmap
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import zstandard
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import closing
+from datetime import date
 from io import BytesIO
+from db_utils import connect_db, http_session
 
 st.set_page_config(layout="wide")
 
@@ -13,149 +24,421 @@ GITHUB_TOKEN = st.secrets["GITHUB_TOKEN"]
 REPO_OWNER = "M00N69"
 REPO_NAME = "RASFFDB"
 FILE_PATH = "rasff_data.db"
-GITHUB_API_URL = f"https://api.github.com/repos/{REPO_OWNER}/{REPO_NAME}/contents/{FILE_PATH}"
+# La base est poussée compressée (zstd) : 3 à 5 fois moins d'octets à encoder et à envoyer
+COMPRESSED_FILE_PATH = f"{FILE_PATH}.zst"
+GITHUB_API_URL = f"https://api.github.com/repos/{REPO_OWNER}/{REPO_NAME}/contents/{COMPRESSED_FILE_PATH}"
 
 DB_PATH = "rasff_data.db"
+COMPACT_PATH = "rasff_compact.db"  # Copie compactée (VACUUM INTO) envoyée sur GitHub
+PARQUET_PATH = "rasff_data.parquet"  # Miroir colonnaire de la table, utilisé pour les lectures
+PAGE_SIZE = 1000  # Nombre d'alertes affichées par page dans le tableau
+# Colonnes à faible cardinalité, stockées comme catégories (codes entiers) dans les DataFrames du tableau de bord
+CATEGORY_COLUMNS = ["notifying_country", "category", "classification", "risk_decision", "type"]
+
+# Colonnes de la table rasff_notifications, dans l'ordre du schéma
+COLUMNS = [
+    "reference", "category", "type", "subject", "date", "notifying_country",
+    "classification", "risk_decision", "distribution", "forAttention",
+    "forFollowUp", "operator", "origin", "hazards"
+]
+# Année et semaine ISO calculées par SQLite à l'insertion, à partir du jeudi de la semaine de 'date'
+ISO_THURSDAY = "date(date, '-3 days', 'weekday 4')"
+ISO_YEAR_SQL = f"CAST(strftime('%Y', {ISO_THURSDAY}) AS INTEGER)"
+ISO_WEEK_SQL = f"(strftime('%j', {ISO_THURSDAY}) - 1) / 7 + 1"
+# Insertion multi-lignes (dans la table temporaire new_alerts) : autant de lignes par requête
+# que la limite de 999 paramètres SQLite le permet
+INSERT_PREFIX = f"INSERT INTO new_alerts ({', '.join(COLUMNS)}) VALUES "
+ROW_PLACEHOLDERS = f"({', '.join(['?'] * len(COLUMNS))})"
+ROWS_PER_INSERT = 999 // len(COLUMNS)
+
+# Connexion SQLite unique, partagée entre les reruns et les sessions, réservée aux lectures
+# (une transaction d'écriture sur cette connexion serait validée ou annulée par les autres sessions)
+@st.cache_resource
+def db():
+    return connect_db(DB_PATH, check_same_thread=False)
+
+# Connexion dédiée à une écriture, fermée après usage : chaque session a sa propre transaction
+# et ses tables temporaires ; le verrou SQLite fait attendre une écriture concurrente
+def write_db():
+    return closing(connect_db(DB_PATH, timeout=30))
 
 # Fonction pour créer les colonnes manquantes
 def add_missing_columns():
-    with sqlite3.connect(DB_PATH) as conn:
+    with write_db() as conn, conn:
         cursor = conn.cursor()
         cursor.execute("ALTER TABLE rasff_notifications ADD COLUMN year INTEGER")
         cursor.execute("ALTER TABLE rasff_notifications ADD COLUMN week INTEGER")
-        cursor.execute("UPDATE rasff_notifications SET year = strftime('%Y', date)")
-        cursor.execute("UPDATE rasff_notifications SET week = strftime('%W', date)")
+        cursor.execute(f"UPDATE rasff_notifications SET year = {ISO_YEAR_SQL}, week = {ISO_WEEK_SQL}")
         conn.commit()
 
-# Vérifier et ajouter les colonnes 'year' et 'week' si nécessaire
-try:
-    add_missing_columns()
-except sqlite3.OperationalError:
-    print("✅ Les colonnes 'year' et 'week' existent déjà.")
+# Fonction pour recalculer une seule fois (suivi par PRAGMA user_version) les colonnes year/week
+# des bases créées avec l'année civile et les semaines '%W' : toute la table passe en année et semaine ISO
+def migrate_iso_weeks():
+    with write_db() as conn:
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= 1:
+            return
+        with conn:
+            conn.execute(f"UPDATE rasff_notifications SET year = {ISO_YEAR_SQL}, week = {ISO_WEEK_SQL}")
+            conn.execute("PRAGMA user_version = 1")
+        # Reporter la migration dans le fichier : sa date change et le miroir Parquet est régénéré
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+# Fonction pour créer les index utilisés par les requêtes du tableau de bord
+def create_indexes():
+    with write_db() as conn, conn:
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_date ON rasff_notifications(date DESC)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_year_week ON rasff_notifications(year, week)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_reference ON rasff_notifications(reference)")
+        # Les filtres de la barre latérale sont appliqués sur la table Arrow : index devenu inutile
+        conn.execute("DROP INDEX IF EXISTS idx_filter")
 
 # Fonction pour télécharger le fichier depuis GitHub
+# (écrit dans un fichier temporaire, renommé seulement une fois complet : un téléchargement
+# interrompu ne laisse jamais une base tronquée à la place de DB_PATH)
 def download_from_github():
-    url = f"https://raw.githubusercontent.com/{REPO_OWNER}/{REPO_NAME}/main/{FILE_PATH}"
-    response = requests.get(url)
-    with open(DB_PATH, "wb") as file:
-        file.write(response.content)
+    part_path = f"{DB_PATH}.part"
+    try:
+        # Téléchargement en flux par blocs de 1 Mo : la base n'est jamais chargée entière en mémoire
+        url = f"https://raw.githubusercontent.com/{REPO_OWNER}/{REPO_NAME}/main/{COMPRESSED_FILE_PATH}"
+        with requests.get(url, stream=True, timeout=30) as response:
+            if response.status_code == 200:
+                with open(part_path, "wb") as file, zstandard.ZstdDecompressor().stream_writer(file) as writer:
+                    for chunk in response.iter_content(chunk_size=1 << 20):
+                        writer.write(chunk)
+                os.replace(part_path, DB_PATH)
+                return
+
+        # Pas encore de version compressée sur GitHub : on récupère la base brute
+        url = f"https://raw.githubusercontent.com/{REPO_OWNER}/{REPO_NAME}/main/{FILE_PATH}"
+        with requests.get(url, stream=True, timeout=30) as response:
+            response.raise_for_status()
+            with open(part_path, "wb") as file:
+                for chunk in response.iter_content(chunk_size=1 << 20):
+                    file.write(chunk)
+        os.replace(part_path, DB_PATH)
+    finally:
+        if os.path.exists(part_path):
+            os.remove(part_path)
 
 # Fonction pour afficher les dernières entrées dans la base de données
 def show_last_entries():
     st.write("📊 Dernières entrées dans la base de données :")
-    with sqlite3.connect(DB_PATH) as conn:
+    with db() as conn:
         df = pd.read_sql("SELECT * FROM rasff_notifications ORDER BY date DESC LIMIT 5", conn)
     st.dataframe(df)
 
-# Fonction pour mettre à jour le fichier sur GitHub
-def update_github():
-    try:
-        with open(DB_PATH, "rb") as file:
-            content = file.read()
-        encoded_content = base64.b64encode(content).decode()
-
+# Fonction pour récupérer le SHA du fichier sur GitHub (conservé dans la session entre deux envois)
+def get_github_sha(refresh=False):
+    if refresh or "github_sha" not in st.session_state:
         response = requests.get(GITHUB_API_URL, headers={
             "Authorization": f"Bearer {GITHUB_TOKEN}"
         })
+        if response.status_code == 404:
+            # Le fichier n'existe pas encore : il sera créé sans SHA
+            st.session_state["github_sha"] = None
+            return None
         if response.status_code != 200:
             st.error("❌ Impossible de récupérer les informations du fichier sur GitHub.")
-            return
-
-        response_data = response.json()
-        sha = response_data.get("sha", None)
+            return None
+        st.session_state["github_sha"] = response.json().get("sha", None)
+    return st.session_state["github_sha"]
 
-        if sha is None:
-            st.error("❌ SHA non trouvé pour le fichier sur GitHub.")
+# Fonction pour mettre à jour le fichier sur GitHub
+def update_github():
+    try:
+        # Copie compactée de la base (sans pages libres ni journal WAL), seule version envoyée
+        if os.path.exists(COMPACT_PATH):
+            os.remove(COMPACT_PATH)
+        with write_db() as conn:
+            conn.execute(f"VACUUM INTO '{COMPACT_PATH}'")
+        # Les index secondaires sont retirés de la copie : create_indexes() les reconstruit au chargement
+        with closing(sqlite3.connect(COMPACT_PATH)) as conn:
+            for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL").fetchall():
+                conn.execute(f"DROP INDEX {name}")
+            conn.execute("VACUUM")
+        # Empreinte et compression lues directement depuis le fichier projeté en mémoire (pas de copie en bytes)
+        with open(COMPACT_PATH, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as raw_content:
+            digest = hashlib.sha256(raw_content).hexdigest()
+            content = None
+            if digest != st.session_state.get("last_pushed"):
+                content = zstandard.ZstdCompressor(level=19).compress(raw_content)
+        os.remove(COMPACT_PATH)
+
+        # Base identique à celle déjà envoyée pendant cette session : rien à pousser
+        if content is None:
+            st.info("ℹ️ Base inchangée depuis le dernier envoi, synchronisation GitHub ignorée.")
             return
 
+        encoded_content = base64.b64encode(content).decode()
+
         data = {
             "message": "Mise à jour automatique de la base RASFF",
             "content": encoded_content,
-            "sha": sha,
             "branch": "main"
         }
+        sha = get_github_sha()
+        if "github_sha" not in st.session_state:
+            return  # Lecture impossible sur GitHub, erreur déjà affichée
+        # SHA du blob Git local ("blob <taille>\0<contenu>") : identique au SHA distant si GitHub a déjà ce contenu
+        if sha == hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest():
+            st.session_state["last_pushed"] = digest
+            st.info("ℹ️ GitHub contient déjà cette version de la base, synchronisation ignorée.")
+            return
+        if sha is not None:
+            data["sha"] = sha
 
         response = requests.put(GITHUB_API_URL, json=data, headers={
             "Authorization": f"Bearer {GITHUB_TOKEN}"
         })
 
+        # SHA obsolète (fichier modifié ailleurs) : on le relit une fois et on renvoie
+        if response.status_code == 409:
+            data["sha"] = get_github_sha(refresh=True)
+            response = requests.put(GITHUB_API_URL, json=data, headers={
+                "Authorization": f"Bearer {GITHUB_TOKEN}"
+            })
+
         if response.status_code in [200, 201]:
+            st.session_state["github_sha"] = response.json()["content"]["sha"]
+            st.session_state["last_pushed"] = digest
             st.success("✅ Mise à jour réussie sur GitHub !")
         else:
             st.error(f"❌ Échec de la mise à jour sur GitHub : {response.json()}")
     except Exception as e:
         st.error(f"❌ Erreur lors de la mise à jour sur GitHub : {e}")
 
-# Fonction pour vérifier la dernière semaine et année dans la base
+# Fonction pour insérer des alertes : chargement par lots dans une table temporaire,
+# puis une seule requête SQL qui écarte les références déjà présentes (index idx_reference) ;
+# les lignes sans référence sont toujours insérées, comme avant
+def insert_alerts(conn, df):
+    df = df.reindex(columns=COLUMNS)
+    df["date"] = df["date"].dt.strftime("%Y-%m-%d %H:%M:%S")
+    df = df.astype(object).where(df.notna(), None)
+    rows = list(df.itertuples(index=False, name=None))
+
+    conn.execute("DROP TABLE IF EXISTS temp.new_alerts")  # reste d'une insertion interrompue
+    conn.execute("CREATE TEMP TABLE new_alerts AS SELECT * FROM rasff_notifications WHERE 0")
+    for start in range(0, len(rows), ROWS_PER_INSERT):
+        batch = rows[start:start + ROWS_PER_INSERT]
+        sql = INSERT_PREFIX + ", ".join([ROW_PLACEHOLDERS] * len(batch))
+        conn.execute(sql, [value for row in batch for value in row])
+    cursor = conn.execute(f"""
+        INSERT INTO rasff_notifications ({', '.join(COLUMNS)}, year, week)
+        SELECT {', '.join(COLUMNS)}, {ISO_YEAR_SQL}, {ISO_WEEK_SQL} FROM new_alerts
+        WHERE reference IS NULL
+           OR reference NOT IN (SELECT reference FROM rasff_notifications WHERE reference IS NOT NULL)
+    """)
+    conn.execute("DROP TABLE new_alerts")
+    return cursor.rowcount
+
+# Fonction pour vérifier la dernière semaine et année dans la base (le couple le plus récent,
+# et non deux maxima indépendants)
 def get_last_update_info():
-    with sqlite3.connect(DB_PATH) as conn:
-        query = "SELECT MAX(year), MAX(week) FROM rasff_notifications"
+    with db() as conn:
+        query = "SELECT year, week FROM rasff_notifications WHERE year IS NOT NULL ORDER BY year DESC, week DESC LIMIT 1"
         result = conn.execute(query).fetchone()
     return result
 
+# Fonction pour lister les semaines ISO (année, semaine) depuis le début d'une année jusqu'à aujourd'hui
+# (un lundi par semaine : les années à 53 semaines sont gérées sans boucle Python)
+def iso_weeks_since(start_year):
+    start = pd.Timestamp(date.fromisocalendar(start_year, 1, 1))
+    iso = pd.date_range(start, pd.Timestamp.now(), freq="W-MON").isocalendar()
+    return list(zip(iso["year"].astype(int), iso["week"].astype(int)))
+
+# Fonction pour construire l'URL du fichier XLS d'une semaine
+def week_url(year, week):
+    return f"https://www.sirene-diffusion.fr/regia/000-rasff/{str(year)[-2:]}/rasff-{year}-{str(week).zfill(2)}.xls"
+
+# Fonction pour vérifier par une requête HEAD qu'un fichier hebdomadaire est publié
+# (en cas de doute, on laisse le GET trancher)
+def week_exists(session, year, week):
+    try:
+        return session.head(week_url(year, week), timeout=5).status_code != 404
+    except requests.RequestException:
+        return True
+
+# Fonction pour télécharger et lire le fichier d'une semaine
+# (exécutée dans un thread : pas d'appel Streamlit ici)
+def fetch_week(session, year, week):
+    response = session.get(week_url(year, week), timeout=15)
+    # Page HTML (erreur ou 404 déguisé) : inutile de la passer au lecteur Excel
+    if response.status_code != 200 or "text/html" in response.headers.get("Content-Type", ""):
+        return None
+    # Seules les colonnes de la table sont lues (les colonnes absentes sont ignorées, pas d'erreur)
+    return pd.read_excel(BytesIO(response.content), engine="calamine", usecols=lambda col: col in COLUMNS)
+
 # Fonction pour télécharger et ajouter les semaines manquantes
 def update_database():
     last_year, last_week = get_last_update_info()
-    current_year = pd.Timestamp.now().year
-    current_week = pd.Timestamp.now().week
-
-    # Vérifier les semaines manquantes dans la base de données
-    with sqlite3.connect(DB_PATH) as conn:
-        query = """
-        SELECT year, week FROM rasff_notifications
-        GROUP BY year, week
-        ORDER BY year, week
-        """
-        existing_weeks = pd.read_sql(query, conn)
-
-    missing_weeks = []
-    for year in range(last_year, current_year + 1):
-        for week in range(1, 53):
-            if year == current_year and week > current_week:
-                break
-            if not ((existing_weeks['year'] == year) & (existing_weeks['week'] == week)).any():
-                missing_weeks.append((year, week))
+
+    # Vérifier les semaines manquantes dans la base de données (un seul parcours de l'index year/week)
+    with db() as conn:
+        existing_weeks = set(conn.execute("SELECT DISTINCT year, week FROM rasff_notifications").fetchall())
+
+    missing_weeks = [yw for yw in iso_weeks_since(last_year) if yw not in existing_weeks]
 
     if missing_weeks:
         st.write(f"🔄 {len(missing_weeks)} semaines manquantes détectées.")
     else:
         st.write("✅ Aucune semaine manquante détectée.")
 
-    # Télécharger et insérer les semaines manquantes
-    for year, week in missing_weeks:
-        week_str = str(week).zfill(2)
-        url = f"https://www.sirene-diffusion.fr/regia/000-rasff/{str(year)[-2:]}/rasff-{year}-{week_str}.xls"
-        response = requests.get(url)
+    # Télécharger les semaines manquantes en parallèle
+    inserted, weeks_done = 0, 0
+    session = http_session()
+    with ThreadPoolExecutor(max_workers=16) as executor, write_db() as write_conn:
+        # Écarter d'abord les semaines non publiées (404) avec des requêtes HEAD parallèles
+        published = list(executor.map(lambda yw: week_exists(session, *yw), missing_weeks))
+        available_weeks = []
+        for (year, week), is_published in zip(missing_weeks, published):
+            if is_published:
+                available_weeks.append((year, week))
+            else:
+                st.write(f"❌ Fichier non trouvé pour {year} - semaine {str(week).zfill(2)}")
+
+        futures = {
+            executor.submit(fetch_week, session, year, week): (year, week)
+            for year, week in available_weeks
+        }
+        progress = st.progress(0.0) if futures else None
+        for done, future in enumerate(as_completed(futures), start=1):
+            progress.progress(done / len(futures), text=f"{done}/{len(futures)} semaines téléchargées")
+            year, week = futures[future]
+            week_str = str(week).zfill(2)
+            try:
+                df = future.result()
+            except Exception as e:
+                st.error(f"❌ Erreur lors du téléchargement de {year} - semaine {week_str} : {e}")
+                continue
+
+            if df is None:
+                st.write(f"❌ Fichier non trouvé pour {year} - semaine {week_str}")
+                continue
+
+            st.write(f"📥 Téléchargement réussi pour {week_url(year, week)}")
+            if 'date' not in df.columns:
+                st.error(f"❌ Colonne 'date' manquante dans le fichier {year} - semaine {week_str}")
+                continue
 
-        if response.status_code == 200:
-            st.write(f"📥 Téléchargement réussi pour {url}")
+            # Nettoyer les espaces superflus (opération vectorisée par colonne texte)
+            for col in df.select_dtypes(include=["object", "string"]).columns:
+                df[col] = df[col].str.strip().fillna(df[col])  # les cellules non textuelles restent intactes
+
+            df['date'] = pd.to_datetime(df['date'], format='%d-%m-%Y %H:%M:%S', errors='coerce')
+
+            # Une transaction par semaine : une mise à jour interrompue reprend aux semaines encore manquantes
             try:
-                df = pd.read_excel(BytesIO(response.content))
-                if 'date' not in df.columns:
-                    st.error(f"❌ Colonne 'date' manquante dans le fichier {year} - semaine {week_str}")
-                    continue
-
-                df['date'] = pd.to_datetime(df['date'], format='%d-%m-%Y %H:%M:%S', errors='coerce')
-                df['year'] = df['date'].dt.year
-                df['week'] = df['date'].dt.isocalendar().week
-
-                with sqlite3.connect(DB_PATH) as conn:
-                    df.to_sql("rasff_notifications", conn, if_exists="append", index=False)
-                st.write(f"✅ Données insérées pour {year} - semaine {week_str}")
+                with write_conn:
+                    inserted += insert_alerts(write_conn, df)
+                weeks_done += 1
             except Exception as e:
-                st.error(f"❌ Erreur lors de l'insertion du fichier Excel : {e}")
-        else:
-            st.write(f"❌ Fichier non trouvé pour {year} - semaine {week_str}")
-            continue
+                st.error(f"❌ Erreur lors de l'insertion de {year} - semaine {week_str} : {e}")
+
+        if weeks_done:
+            # Reporter le journal WAL dans le fichier : GitHub reçoit une base complète et sa date change
+            write_conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    if weeks_done:
+        st.write(f"✅ {inserted} alertes insérées pour {weeks_done} semaines")
 
     if not missing_weeks:
         st.write("✅ Toutes les semaines sont déjà à jour.")
     else:
         st.write("✅ Mise à jour des semaines manquantes terminée.")
 
-# Initialisation
-if not os.path.exists(DB_PATH):
-    download_from_github()
+# Fonction pour lister les années présentes dans la base (mise en cache jusqu'au prochain changement du fichier)
+@st.cache_data(max_entries=1)
+def get_available_years(db_mtime):
+    with db() as conn:
+        rows = conn.execute(
+            "SELECT DISTINCT year FROM rasff_notifications WHERE year IS NOT NULL ORDER BY year DESC"
+        ).fetchall()
+    return [row[0] for row in rows]
+
+# Fonction pour lister les valeurs possibles d'un filtre (pays, catégorie)
+@st.cache_data(max_entries=4)
+def get_filter_values(column, db_mtime):
+    with db() as conn:
+        rows = conn.execute(
+            f"SELECT DISTINCT {column} FROM rasff_notifications WHERE {column} IS NOT NULL ORDER BY {column}"
+        ).fetchall()
+    return [row[0] for row in rows]
+
+# Fonction pour appliquer les filtres de la barre latérale à la table Arrow partagée
+# (masque calculé par pyarrow.compute, sans conversion en pandas ; db_mtime invalide le cache
+# dès que le fichier de la base change, et le nombre d'entrées est borné ;
+# cache_resource : la table filtrée est partagée sans copie entre les reruns)
+@st.cache_resource(max_entries=16)
+def load_alerts(year, wk_lo, wk_hi, country, category, db_mtime):
+    table = load_arrow(db_mtime)
+    masks = []
+    if year is not None:
+        masks += [
+            pc.equal(table["year"], year),
+            pc.greater_equal(table["week"], wk_lo),
+            pc.less_equal(table["week"], wk_hi),
+        ]
+    if country is not None:
+        masks.append(pc.equal(table["notifying_country"], country))
+    if category is not None:
+        masks.append(pc.equal(table["category"], category))
+    if not masks:
+        return table
+    return table.filter(functools.reduce(pc.and_, masks))
+
+# Fonction pour calculer les 10 pays les plus notifiants pour les filtres courants
+# (agrégation faite par pyarrow sur la table déjà filtrée et mise en cache : changer de page ne la recalcule pas)
+@st.cache_data(max_entries=16)
+def top_countries(year, wk_lo, wk_hi, country, category, db_mtime):
+    counts = (
+        load_alerts(year, wk_lo, wk_hi, country, category, db_mtime)
+        .group_by("notifying_country")
+        .aggregate([([], "count_all")])
+        .sort_by([("count_all", "descending")])
+        .slice(0, 10)
+    )
+    return pd.Series(
+        counts["count_all"].to_pylist(), index=counts["notifying_country"].to_pylist(), name="count"
+    )
+
+# Fonction pour charger toute la table une seule fois en mémoire (table Arrow partagée)
+# Le miroir Parquet est relu s'il a été construit à partir de cette version de la base (db_mtime
+# enregistré dans ses métadonnées), sinon il est régénéré depuis SQLite et remplacé d'un bloc
+@st.cache_resource(max_entries=1)
+def load_arrow(db_mtime):
+    source = repr(db_mtime).encode()
+    if os.path.exists(PARQUET_PATH) and (pq.read_schema(PARQUET_PATH).metadata or {}).get(b"db_mtime") == source:
+        return pq.read_table(PARQUET_PATH)
+    with db() as conn:
+        df = pd.read_sql("SELECT * FROM rasff_notifications ORDER BY date DESC", conn, dtype_backend="pyarrow")
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for col in CATEGORY_COLUMNS:
+        table = table.set_column(table.schema.get_field_index(col), col, table[col].dictionary_encode())
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), b"db_mtime": source})
+    pq.write_table(table, f"{PARQUET_PATH}.part", compression="zstd")
+    os.replace(f"{PARQUET_PATH}.part", PARQUET_PATH)
+    return table
+
+# Types pandas des colonnes Arrow : les colonnes dictionnaire deviennent des catégories pandas
+def arrow_types_mapper(arrow_type):
+    return None if pa.types.is_dictionary(arrow_type) else pd.ArrowDtype(arrow_type)
+
+# Initialisation, exécutée une seule fois par processus et non à chaque rerun Streamlit
+# (le téléchargement doit précéder la première ouverture de la base)
+@st.cache_resource
+def init_database():
+    if not os.path.exists(DB_PATH):
+        download_from_github()
+
+    # Vérifier et ajouter les colonnes 'year' et 'week' si nécessaire
+    try:
+        add_missing_columns()
+    except sqlite3.OperationalError:
+        print("✅ Les colonnes 'year' et 'week' existent déjà.")
+    migrate_iso_weeks()
+    create_indexes()
+
+init_database()
 
 # Interface Streamlit
 def main():
@@ -166,32 +449,35 @@ def main():
         st.write("📥 Téléchargement des nouvelles données et des semaines manquantes...")
         update_database()
         show_last_entries()
+        # update_github n'envoie rien si GitHub a déjà cette version de la base (un envoi échoué est retenté)
         st.write("📤 Synchronisation avec GitHub...")
         update_github()
 
-    # Récupération des données
-    with sqlite3.connect(DB_PATH) as conn:
-        df = pd.read_sql("SELECT * FROM rasff_notifications", conn)
-
     # Filtrage
-    selected_country = st.sidebar.selectbox("Pays", ["Tous"] + sorted(df["notifying_country"].unique()))
-    selected_year = st.sidebar.selectbox("Année", ["Tous"] + sorted(df["year"].unique(), reverse=True))
-    selected_category = st.sidebar.selectbox("Catégorie", ["Toutes"] + sorted(df["category"].unique()))
-
-    # Application des filtres
-    filtered_df = df.copy()
-    if selected_country != "Tous":
-        filtered_df = filtered_df[filtered_df["notifying_country"] == selected_country]
+    db_mtime = os.path.getmtime(DB_PATH)
+    selected_year = st.sidebar.selectbox("Année", ["Tous"] + get_available_years(db_mtime))
+    wk_lo, wk_hi = 1, 53
     if selected_year != "Tous":
-        filtered_df = filtered_df[filtered_df["year"] == selected_year]
-    if selected_category != "Toutes":
-        filtered_df = filtered_df[filtered_df["category"] == selected_category]
-
-    st.write(f"## 📊 {len(filtered_df)} alertes ({selected_year})")
-    st.dataframe(filtered_df, height=600)
+        wk_lo, wk_hi = st.sidebar.slider("Semaines", 1, 53, (1, 53))
+    selected_country = st.sidebar.selectbox("Pays", ["Tous"] + get_filter_values("notifying_country", db_mtime))
+    selected_category = st.sidebar.selectbox("Catégorie", ["Toutes"] + get_filter_values("category", db_mtime))
+
+    filters = (
+        None if selected_year == "Tous" else int(selected_year), wk_lo, wk_hi,
+        None if selected_country == "Tous" else selected_country,
+        None if selected_category == "Toutes" else selected_category,
+    )
+
+    # Filtrage et comptage sur la table Arrow : seule la page affichée est convertie en pandas
+    table = load_alerts(*filters, db_mtime)
+    st.write(f"## 📊 {table.num_rows} alertes ({selected_year})")
+    page_count = max(1, -(-table.num_rows // PAGE_SIZE))
+    page = st.number_input(f"Page (sur {page_count})", min_value=1, max_value=page_count, value=1)
+    start = (page - 1) * PAGE_SIZE
+    st.dataframe(table.slice(start, PAGE_SIZE).to_pandas(types_mapper=arrow_types_mapper), height=600)
 
     st.write("## 🌟 Répartition par pays")
-    st.bar_chart(filtered_df["notifying_country"].value_counts().head(10))
+    st.bar_chart(top_countries(*filters, db_mtime))
 
 if __name__ == "__main__":
     main()
@@ -4,6 +4,7 @@ import sqlite3
 import os
 import requests
 import base64
+import zstandard
 from io import BytesIO
 
 st.set_page_config(layout="wide")
@@ -14,7 +15,9 @@ GITHUB_TOKEN = st.secrets["GITHUB_TOKEN"]
 REPO_OWNER = "M00N69"
 REPO_NAME = "RASFFDB"
 FILE_PATH = "rasff_data.db"
-GITHUB_API_URL = f"https://api.github.com/repos/{REPO_OWNER}/{REPO_NAME}/contents/{FILE_PATH}"
+# Même artefact que RASFFDB.py : la base est publiée compressée (zstd) sous rasff_data.db.zst
+COMPRESSED_FILE_PATH = f"{FILE_PATH}.zst"
+GITHUB_API_URL = f"https://api.github.com/repos/{REPO_OWNER}/{REPO_NAME}/contents/{COMPRESSED_FILE_PATH}"
 
 DB_PATH = "rasff_data.db"
 
@@ -38,16 +41,21 @@ except sqlite3.OperationalError:
 
 # Fonction pour télécharger le fichier depuis GitHub
 def download_from_github():
-    url = f"https://raw.githubusercontent.com/{REPO_OWNER}/{REPO_NAME}/main/{FILE_PATH}"
+    url = f"https://raw.githubusercontent.com/{REPO_OWNER}/{REPO_NAME}/main/{COMPRESSED_FILE_PATH}"
     response = requests.get(url)
+    if response.status_code == 200:
+        content = zstandard.ZstdDecompressor().decompress(response.content)
+    else:
+        # Pas encore de version compressée sur GitHub : on récupère la base brute
+        content = requests.get(f"https://raw.githubusercontent.com/{REPO_OWNER}/{REPO_NAME}/main/{FILE_PATH}").content
     with open(DB_PATH, "wb") as file:
-        file.write(response.content)
+        file.write(content)
 
 # Fonction pour mettre à jour le fichier sur GitHub
 def update_github():
     with open(DB_PATH, "rb") as file:
         content = file.read()
-    encoded_content = base64.b64encode(content).decode()
+    encoded_content = base64.b64encode(zstandard.ZstdCompressor(level=10).compress(content)).decode()
 
     response = requests.get(GITHUB_API_URL, headers={
         "Authorization": f"Bearer {GITHUB_TOKEN}"
@@ -0,0 +1,29 @@
+import streamlit as st
+import sqlite3
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Outils partagés par le tableau de bord (RASFFDB.py) et la page de mise à jour (page/update.py)
+# Module sans effet de bord à l'import : ni secrets Streamlit, ni accès à la base
+
+# Fonction pour ouvrir une connexion SQLite (WAL + cache de pages et lecture mmap)
+def connect_db(path, **kwargs):
+    conn = sqlite3.connect(path, **kwargs)
+    conn.executescript("""
+        PRAGMA journal_mode=WAL;
+        PRAGMA synchronous=NORMAL;
+        PRAGMA mmap_size=268435456;
+        PRAGMA cache_size=-65536;
+        PRAGMA temp_store=MEMORY;
+    """)
+    return conn
+
+# Session HTTP partagée : connexions keep-alive réutilisées par les téléchargements parallèles
+@st.cache_resource
+def http_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32,
+                          max_retries=Retry(total=2, backoff_factor=0.3))
+    session.mount("https://", adapter)
+    return session
@@ -1,8 +1,10 @@
 import streamlit as st
 import pandas as pd
-import sqlite3
 import requests
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
+from db_utils import connect_db, http_session
 
 # === CONFIGURATION ===
 DB_PATH = "rasff_data.db"
@@ -26,51 +28,72 @@ def update_page():
     st.title("Mise à jour des données RASFF")
     st.write("Ici, vous pouvez mettre à jour les alertes RASFF en téléchargeant de nouvelles données.")
 
-def download_xls(year, week):
-    """Télécharge un fichier XLS à partir de l'URL"""
+def download_xls(session, year, week):
+    """Télécharge un fichier XLS à partir de l'URL (appelable depuis un thread)"""
     url = f"https://www.sirene-diffusion.fr/regia/000-rasff/{str(year)[2:]}/rasff-{year}-{str(week).zfill(2)}.xls"
     try:
-        response = requests.get(url, timeout=10)
+        response = session.get(url, timeout=10)
         response.raise_for_status()
-        return BytesIO(response.content)
+        if "text/html" in response.headers.get("Content-Type", ""):
+            return None  # Page d'erreur HTML servie à la place du fichier XLS
+        return response.content
     except requests.RequestException:
         return None
 
+@st.cache_data(max_entries=64)
 def extract_and_clean_xls(xls_data):
-    """Lit et nettoie les données d'un fichier XLS"""
-    df = pd.read_excel(xls_data)
+    """Lit et nettoie les données d'un fichier XLS (mis en cache selon le contenu du fichier)"""
+    df = pd.read_excel(BytesIO(xls_data), engine="calamine", usecols=lambda col: col in COLUMN_MAPPING)  # Colonnes utiles seulement
     
     # Renommer les colonnes selon le mapping
     df = df.rename(columns=COLUMN_MAPPING)
     
+    # Supprimer les espaces superflus ; fillna remet les nombres et dates que .str transforme en NaN
+    for col in df.select_dtypes(include=["object", "string"]).columns:
+        df[col] = df[col].str.strip().fillna(df[col])
+    
     # Ajouter les colonnes manquantes avec valeur None
     for col in COLUMN_MAPPING.values():
         if col not in df.columns:
             df[col] = None
     
-    # Convertir les dates
-    df["date_of_case"] = pd.to_datetime(df["date_of_case"], errors="coerce").dt.strftime("%Y-%m-%d")
+    # Convertir les dates (troncature au jour et formatage ISO faits par numpy, sans strftime ligne à ligne)
+    dates = pd.to_datetime(df["date_of_case"], format="%d-%m-%Y %H:%M:%S", errors="coerce")
+    iso_days = pd.Series(dates.to_numpy().astype("datetime64[D]").astype(str), index=df.index)
+    df["date_of_case"] = iso_days.where(dates.notna(), None)
     
     return df[list(COLUMN_MAPPING.values())]  # Garder uniquement les colonnes utiles
 
 def update_database(new_data):
-    """Insère les nouvelles données dans la base SQLite en évitant les doublons"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    """Insère les nouvelles données dans la base SQLite, les références déjà présentes étant écartées par SQLite"""
+    with closing(connect_db(DB_PATH)) as conn:
+        # Index (non unique : la table peut déjà contenir des références en double) pour le filtre NOT IN
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_rasff_data_ref ON rasff_data(reference)")
+        last_rowid = conn.execute("SELECT COALESCE(MAX(rowid), 0) FROM rasff_data").fetchone()[0]
 
-    # Vérifier les références existantes pour éviter les doublons
-    existing_refs = pd.read_sql("SELECT reference FROM rasff_data", conn)["reference"].tolist()
-    new_data = new_data[~new_data["reference"].isin(existing_refs)]
-    
-    # Insérer les nouvelles données
-    if not new_data.empty:
-        new_data.to_sql("rasff_data", conn, if_exists="append", index=False)
-        st.success(f"{len(new_data)} nouvelles alertes ajoutées !")
-    else:
-        st.info("Aucune nouvelle alerte à ajouter.")
-    
-    conn.close()
-    return new_data
+        # Charger le lot dans une table temporaire puis l'insérer en une seule requête SQL
+        columns = list(new_data.columns)
+        rows = new_data.astype(object).where(new_data.notna(), None).itertuples(index=False, name=None)
+        with conn:
+            conn.execute("CREATE TEMP TABLE stg AS SELECT * FROM rasff_data WHERE 0")
+            conn.executemany(
+                f"INSERT INTO stg ({', '.join(columns)}) VALUES ({', '.join(['?'] * len(columns))})", rows
+            )
+            cursor = conn.execute(f"""
+                INSERT INTO rasff_data ({', '.join(columns)}) SELECT {', '.join(columns)} FROM stg
+                WHERE reference IS NULL
+                   OR reference NOT IN (SELECT reference FROM rasff_data WHERE reference IS NOT NULL)
+            """)
+            conn.execute("DROP TABLE stg")
+        total_added = cursor.rowcount
+
+        if total_added > 0:
+            st.success(f"{total_added} nouvelles alertes ajoutées !")
+        else:
+            st.info("Aucune nouvelle alerte à ajouter.")
+
+        # Les lignes ajoutées sont celles dont le rowid dépasse l'ancien maximum
+        return pd.read_sql("SELECT * FROM rasff_data WHERE rowid > ?", conn, params=(last_rowid,))
 
 # === INTERFACE STREAMLIT ===
 st.title("🔄 Mise à jour des alertes RASFF")
@@ -79,10 +102,14 @@ selected_weeks = st.multiselect("Sélectionnez les semaines à mettre à jour :"
 
 if st.button("Mettre à jour la base de données"):
     all_new_data = []
+    session = http_session()
+    
+    # Télécharger toutes les semaines en parallèle ; l'analyse et l'affichage restent dans le thread principal
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        downloads = list(executor.map(lambda week: download_xls(session, YEAR, week), selected_weeks))
     
-    for week in selected_weeks:
+    for week, xls_data in zip(selected_weeks, downloads):
         st.write(f"🔍 Vérification de la semaine {week}...")
-        xls_data = download_xls(YEAR, week)
         
         if xls_data:
             df = extract_and_clean_xls(xls_data)